@@ -0,0 +1,602 @@
+import re
+import sys
+import time
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+# Các hàm không tất định, biến (@x, @@x) và câu đọc có khóa: không được trả lời từ cache.
+# CURRENT_*, LOCALTIME, UTC_* dùng được cả khi không có dấu ngoặc
+_NON_DETERMINISTIC = re.compile(
+    r"\b(?:RAND|NOW|SYSDATE|CURDATE|CURTIME|UUID|UUID_SHORT|UNIX_TIMESTAMP|SLEEP|RANDOM_BYTES|"
+    r"LAST_INSERT_ID|CONNECTION_ID|FOUND_ROWS|ROW_COUNT|DATABASE|SCHEMA|USER|SESSION_USER|"
+    r"SYSTEM_USER|GET_LOCK|IS_FREE_LOCK|IS_USED_LOCK|BENCHMARK)\s*\(|"
+    r"\b(?:CURRENT_\w+|LOCALTIME|LOCALTIMESTAMP|UTC_DATE|UTC_TIME|UTC_TIMESTAMP)\b|"
+    r"\bFOR\s+UPDATE\b|\bFOR\s+SHARE\b|\bLOCK\s+IN\s+SHARE\s+MODE\b|@",
+    re.IGNORECASE
+)
+# Lời gọi hàm trong câu SELECT: chỉ cache khi mọi hàm đều là hàm có sẵn tất định.
+# Hàm tự định nghĩa (stored function) có thể đọc bảng khác hoặc không tất định
+_FUNCTION_CALL = re.compile(r"([`\w$]+)\s*\(")
+_DETERMINISTIC_FUNCTIONS = {
+    # Từ khóa SQL đứng trước dấu ngoặc
+    'in', 'and', 'or', 'not', 'using', 'on', 'as', 'is', 'like', 'between', 'when', 'then',
+    'else', 'case', 'over', 'by', 'distinct', 'all', 'interval',
+    # Hàm tổng hợp và hàm có sẵn tất định
+    'count', 'sum', 'min', 'max', 'avg', 'group_concat', 'concat', 'concat_ws', 'lower',
+    'upper', 'length', 'char_length', 'substring', 'substr', 'trim', 'ltrim', 'rtrim',
+    'replace', 'left', 'right', 'lpad', 'rpad', 'locate', 'instr', 'coalesce', 'ifnull',
+    'nullif', 'if', 'abs', 'round', 'floor', 'ceil', 'ceiling', 'mod', 'cast', 'convert',
+    'greatest', 'least', 'field', 'find_in_set', 'hex', 'md5', 'sha1', 'sha2', 'date',
+    'year', 'month', 'day', 'hour', 'minute', 'second', 'date_format', 'date_add',
+    'date_sub', 'datediff', 'str_to_date', 'json_extract', 'json_unquote'
+}
+_QUOTED = re.compile(r"('(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`)")
+_STRING = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+
+# Mệnh đề FROM của câu SELECT kết thúc ở mệnh đề kế tiếp
+_FROM_CLAUSE = re.compile(
+    r"\bFROM\s+(.*?)\s*(?:\bWHERE\b|\bGROUP\s+BY\b|\bHAVING\b|\bORDER\s+BY\b|"
+    r"\bLIMIT\b|\bWINDOW\b|\bPROCEDURE\b|$)",
+    re.IGNORECASE | re.DOTALL
+)
+_JOIN = re.compile(
+    r",|\bSTRAIGHT_JOIN\b|\b(?:NATURAL\s+)?(?:(?:LEFT|RIGHT)(?:\s+OUTER)?\s+|INNER\s+|CROSS\s+)?JOIN\b",
+    re.IGNORECASE
+)
+_JOIN_CONDITION = re.compile(r"\b(?:ON|USING)\b", re.IGNORECASE)
+_TABLE_REF = re.compile(r"^([`\w$]+(?:\.[`\w$]+)?)(?:\s+(?:AS\s+)?([`\w$]+))?$", re.IGNORECASE)
+_RESERVED = {
+    'where', 'group', 'having', 'order', 'limit', 'on', 'using', 'join', 'inner', 'left',
+    'right', 'cross', 'natural', 'straight_join', 'use', 'force', 'ignore', 'partition',
+    'set', 'select', 'from', 'union', 'values'
+}
+
+# Câu lệnh không thay đổi dữ liệu: không cần invalidate
+_NO_WRITE = re.compile(
+    r"^(?:SELECT|SHOW|DESC|DESCRIBE|EXPLAIN|USE|SET|BEGIN|START\s+TRANSACTION|COMMIT|ROLLBACK|"
+    r"SAVEPOINT|RELEASE)\b",
+    re.IGNORECASE
+)
+_INSERT = re.compile(
+    r"^(?:INSERT|REPLACE)(?:\s+(?:LOW_PRIORITY|DELAYED|HIGH_PRIORITY|IGNORE))*\s+(?:INTO\s+)?"
+    r"([`\w$]+(?:\.[`\w$]+)?)",
+    re.IGNORECASE
+)
+_UPDATE = re.compile(r"^UPDATE(?:\s+(?:LOW_PRIORITY|IGNORE))*\s+(.*?)\s+SET\b", re.IGNORECASE | re.DOTALL)
+_DELETE = re.compile(
+    r"^DELETE(?:\s+(?:LOW_PRIORITY|QUICK|IGNORE))*\s+(.*?)\s*(?:\bWHERE\b|\bORDER\s+BY\b|\bLIMIT\b|$)",
+    re.IGNORECASE | re.DOTALL
+)
+_DDL = re.compile(
+    r"^(?:TRUNCATE(?:\s+TABLE)?|ALTER(?:\s+(?:ONLINE|IGNORE))*\s+TABLE|"
+    r"DROP(?:\s+TEMPORARY)?\s+TABLES?(?:\s+IF\s+EXISTS)?|"
+    r"RENAME\s+TABLES?|LOAD\s+DATA\b.*?\bINTO\s+TABLE)\s+(.*?)\s*(?:\b(?:RESTRICT|CASCADE)\b.*)?$",
+    re.IGNORECASE | re.DOTALL
+)
+
+# Các hàm phân tích SQL được memoize vì cùng một câu SQL được lặp lại rất nhiều lần
+@lru_cache(maxsize=4096)
+def normalize_sql(sql):
+    """
+    Chuẩn hóa câu SQL để làm khóa cache: gộp khoảng trắng và bỏ dấu ';' cuối,
+    giữ nguyên nội dung nằm trong dấu nháy
+
+    :param sql: Câu lệnh SQL
+    :return: Câu SQL đã chuẩn hóa
+    """
+    parts = _QUOTED.split(sql.strip().rstrip(';'))
+    for i in range(0, len(parts), 2):
+        parts[i] = re.sub(r"\s+", " ", parts[i])
+    return ''.join(parts).strip()
+
+
+def _table_name(name):
+    # Bỏ dấu ` và tiền tố database để so khớp theo tên bảng
+    return name.replace('`', '').split('.')[-1].lower()
+
+
+def _parse_table_refs(clause):
+    """
+    Lấy tên bảng từ danh sách bảng (phân tách bởi dấu phẩy hoặc JOIN, có alias)
+
+    :param clause: Danh sách bảng, ví dụ "t1 a, t2 b JOIN t3 ON ..."
+    :return: Tập tên bảng, hoặc None nếu có phần không phân tích chắc chắn được
+    """
+    if not clause.strip():
+        return None
+    tables = set()
+    for part in _JOIN.split(clause):
+        ref = _JOIN_CONDITION.split(part)[0].strip()
+        match = _TABLE_REF.match(ref)
+        if not match:
+            return None
+        name, alias = match.groups()
+        if _table_name(name) in _RESERVED or (alias and alias.lower() in _RESERVED):
+            return None
+        tables.add(_table_name(name))
+    return frozenset(tables)
+
+
+@lru_cache(maxsize=4096)
+def _read_tables(sql):
+    """
+    Xác định các bảng mà câu SELECT đọc
+
+    :param sql: Câu SELECT đã chuẩn hóa
+    :return: Tập tên bảng, hoặc None nếu không xác định chắc chắn được
+             (subquery, UNION, SELECT ... INTO, index hint, ...)
+    """
+    stripped = _STRING.sub("''", sql)
+    if len(re.findall(r"\bSELECT\b", stripped, re.IGNORECASE)) != 1:
+        return None
+    if re.search(r"\b(?:UNION|INTO)\b", stripped, re.IGNORECASE):
+        return None
+    match = _FROM_CLAUSE.search(stripped)
+    if not match:
+        return None
+    return _parse_table_refs(match.group(1))
+
+
+@lru_cache(maxsize=4096)
+def _write_tables(sql):
+    # Kết quả được memoize nên trả về frozenset, xem write_tables
+    stripped = _STRING.sub("''", normalize_sql(sql))
+    if _NO_WRITE.match(stripped):
+        return frozenset()
+
+    match = _INSERT.match(stripped)
+    if match:
+        return frozenset([_table_name(match.group(1))])
+
+    match = _UPDATE.match(stripped)
+    if match:
+        return _parse_table_refs(match.group(1))
+
+    match = _DELETE.match(stripped)
+    if match:
+        # Gồm cả dạng nhiều bảng: "t1 FROM t1 JOIN t2 ..." và "FROM t1, t2 USING ..."
+        tables = set()
+        for part in re.split(r"\b(?:FROM|USING)\b", match.group(1), flags=re.IGNORECASE):
+            part = re.sub(r"\.\*", "", part).strip()
+            if not part:
+                continue
+            part_tables = _parse_table_refs(part)
+            if part_tables is None:
+                return None
+            tables |= part_tables
+        return frozenset(tables) or None
+
+    match = _DDL.match(stripped)
+    if match:
+        clause = match.group(1)
+        if re.match(r"^(?:DROP|RENAME)\b", stripped, re.IGNORECASE):
+            # RENAME TABLE a TO b, c TO d: invalidate cả tên cũ và tên mới
+            clause = re.sub(r"\s+TO\s+", ", ", clause, flags=re.IGNORECASE)
+        else:
+            # TRUNCATE / ALTER / LOAD DATA chỉ tác động lên một bảng
+            clause = clause.split()[0] if clause else ''
+        return _parse_table_refs(clause)
+
+    return None
+
+
+def _estimate_size(value):
+    """Ước lượng số byte bộ nhớ của một kết quả truy vấn"""
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        size += sum(_estimate_size(item) for item in value)
+    elif isinstance(value, dict):
+        size += sum(_estimate_size(k) + _estimate_size(v) for k, v in value.items())
+    return size
+
+
+def write_tables(sql):
+    """
+    Xác định các bảng bị thay đổi bởi một câu lệnh ghi
+
+    :param sql: Câu lệnh gửi lên master
+    :return: Tập tên bảng (rỗng nếu câu lệnh không ghi dữ liệu),
+             hoặc None nếu không xác định chắc chắn được
+    """
+    tables = _write_tables(sql)
+    return set(tables) if tables is not None else None
+
+
+@lru_cache(maxsize=4096)
+def _is_cacheable(sql):
+    normalized = normalize_sql(sql)
+    if not normalized[:6].upper() == 'SELECT':
+        return False
+    if _NON_DETERMINISTIC.search(_QUOTED.sub("''", normalized)):
+        return False
+    for name in _FUNCTION_CALL.findall(_STRING.sub("''", normalized)):
+        if name.lower() not in _DETERMINISTIC_FUNCTIONS:
+            return False
+    return _read_tables(normalized) is not None
+
+
+class QueryResultCache:
+    def __init__(self, max_entries=10000, max_bytes=64 * 1024 * 1024, ttl=30.0, write_holdoff=1.0):
+        """
+        Cache kết quả truy vấn phía client đặt trước các kết nối slave.
+
+        Invalidate khi ghi chỉ dựa trên các bảng xuất hiện trong câu lệnh ghi gửi qua
+        cùng client, nên không phát hiện được: thay đổi do trigger, bảng con bị
+        ON DELETE/UPDATE CASCADE, view đọc từ bảng bị ghi, và các câu ghi từ client
+        khác. Với những trường hợp này TTL là giới hạn độ mới duy nhất. Câu SELECT gọi
+        hàm không nằm trong danh sách hàm có sẵn tất định (ví dụ stored function)
+        không được cache.
+
+        :param max_entries: Số lượng kết quả tối đa được giữ trong cache
+        :param max_bytes: Ngân sách bộ nhớ (byte) cho toàn bộ cache
+        :param ttl: Thời gian sống (giây) của mỗi kết quả, None để tắt TTL
+        :param write_holdoff: Số giây không nhận kết quả mới của một bảng sau khi
+                              bảng đó bị invalidate, nên lớn hơn độ trễ replication.
+                              Holdoff áp dụng cho toàn bộ bảng: bảng được ghi thường
+                              xuyên hơn mỗi write_holdoff giây sẽ không bao giờ được cache
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.write_holdoff = write_holdoff
+
+        # key -> (rows, tables, size, expires_at), thứ tự theo LRU
+        self._entries = OrderedDict()
+        # Tên bảng -> tập khóa cache đọc từ bảng đó
+        self._table_index = {}
+        self._current_bytes = 0
+        # Tên bảng -> thời điểm invalidate gần nhất, None là toàn bộ cache
+        self._invalidated_at = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def is_cacheable(sql):
+        """Chỉ cache câu SELECT tất định và xác định được bảng nguồn"""
+        return _is_cacheable(sql)
+
+    @staticmethod
+    def make_key(sql, params=None, database=None):
+        """Tạo khóa cache từ database, câu SQL đã chuẩn hóa và tham số"""
+        if isinstance(params, dict):
+            params = tuple(sorted(params.items()))
+        elif params is not None:
+            params = tuple(params)
+        return (database, normalize_sql(sql), params)
+
+    def get(self, key):
+        """
+        Lấy kết quả đã cache
+
+        :param key: Khóa cache từ make_key
+        :return: Bản sao danh sách bản ghi hoặc None nếu không có / đã hết hạn.
+                 Bản ghi dạng dict (cursor dictionary=True) dùng chung với cache,
+                 không được sửa trực tiếp
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[3] is not None and entry[3] <= time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(entry[0])
+
+    def put(self, key, sql, rows, read_started=None):
+        """
+        Lưu kết quả truy vấn vào cache, loại bỏ các kết quả ít dùng nhất
+        khi vượt quá số lượng hoặc ngân sách bộ nhớ
+
+        :param key: Khóa cache từ make_key
+        :param sql: Câu SQL gốc, dùng để xác định bảng phục vụ invalidation
+        :param rows: Danh sách bản ghi trả về từ slave
+        :param read_started: Thời điểm (time.monotonic) bắt đầu đọc từ slave,
+                             kết quả bị bỏ qua nếu bảng bị invalidate sau thời điểm này
+        :return: True nếu kết quả được lưu
+        """
+        tables = _read_tables(normalize_sql(sql))
+        # Lưu bản sao dạng tuple để người gọi sửa danh sách không ảnh hưởng tới cache
+        rows = tuple(rows)
+        size = _estimate_size(rows)
+        if tables is None or size > self.max_bytes:
+            return False
+
+        now = time.monotonic()
+        expires_at = now + self.ttl if self.ttl is not None else None
+
+        with self._lock:
+            # Không nhận kết quả có thể đã cũ: đọc trước khi invalidate, hoặc
+            # đọc trong khoảng holdoff khi slave có thể chưa áp dụng câu ghi
+            for table in list(tables) + [None]:
+                invalidated_at = self._invalidated_at.get(table)
+                if invalidated_at is None:
+                    continue
+                if read_started is not None and read_started <= invalidated_at:
+                    return False
+                if now < invalidated_at + self.write_holdoff:
+                    return False
+
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (rows, tables, size, expires_at)
+            self._current_bytes += size
+            for table in tables:
+                self._table_index.setdefault(table, set()).add(key)
+
+            while len(self._entries) > self.max_entries or self._current_bytes > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+            return True
+
+    def invalidate_table(self, table):
+        """Xóa toàn bộ kết quả đã cache có đọc từ bảng"""
+        table = _table_name(table)
+        with self._lock:
+            self._invalidated_at[table] = time.monotonic()
+            keys = self._table_index.pop(table, set())
+            for key in list(keys):
+                if key in self._entries:
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def invalidate_all(self):
+        """Xóa toàn bộ cache khi không xác định được bảng bị thay đổi"""
+        with self._lock:
+            self._invalidated_at[None] = time.monotonic()
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._table_index.clear()
+            self._current_bytes = 0
+
+    def invalidate_tables(self, tables):
+        """
+        Invalidate một tập bảng
+
+        :param tables: Tập tên bảng, None để xóa toàn bộ cache
+        """
+        if tables is None:
+            self.invalidate_all()
+            return
+        for table in tables:
+            self.invalidate_table(table)
+
+    def invalidate_for_write(self, sql):
+        """
+        Invalidate theo câu lệnh ghi gửi lên master qua cùng client.
+        Nếu không xác định chắc chắn được bảng bị ghi thì xóa toàn bộ cache
+
+        :param sql: Câu lệnh ghi (INSERT/UPDATE/DELETE/...)
+        :return: Tập tên bảng bị invalidate (rỗng nếu câu lệnh không ghi),
+                 None nếu toàn bộ cache bị xóa
+        """
+        tables = write_tables(sql)
+        self.invalidate_tables(tables)
+        return tables
+
+    def clear(self):
+        """Xóa toàn bộ cache và lịch sử invalidate, không tính vào thống kê"""
+        with self._lock:
+            self._entries.clear()
+            self._table_index.clear()
+            self._invalidated_at.clear()
+            self._current_bytes = 0
+
+    def _remove(self, key):
+        # Gọi khi đã giữ lock
+        rows, tables, size, _ = self._entries.pop(key)
+        self._current_bytes -= size
+        for table in tables:
+            keys = self._table_index.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._table_index[table]
+
+    def execute(self, cursor, sql, params=None, database=None):
+        """
+        Read-through: trả về kết quả từ cache, nếu chưa có thì thực thi
+        trên cursor của slave và lưu lại
+
+        :param cursor: Cursor của kết nối slave
+        :param sql: Câu SELECT
+        :param params: Tham số truy vấn
+        :param database: Database đang dùng, tránh trùng khóa giữa các database
+        :return: Danh sách bản ghi
+        """
+        if not self.is_cacheable(sql):
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+        key = self.make_key(sql, params, database)
+        rows = self.get(key)
+        if rows is None:
+            read_started = time.monotonic()
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+            self.put(key, sql, rows, read_started=read_started)
+        return rows
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'entries': len(self._entries),
+                'bytes': self._current_bytes
+            }
+
+
+def _self_check():
+    """Kiểm tra phần xử lý SQL và LRU/TTL/ngân sách bộ nhớ, không cần database"""
+
+    class FakeCursor:
+        def __init__(self):
+            self.executed = 0
+            self.params = None
+
+        def execute(self, sql, params=None):
+            self.executed += 1
+            self.params = params
+
+        def fetchall(self):
+            return [(self.params,)]
+
+    # Chuẩn hóa khóa
+    assert normalize_sql("SELECT *\n  FROM   t WHERE  x = 'a  b' ;") == "SELECT * FROM t WHERE x = 'a  b'"
+    assert QueryResultCache.make_key("SELECT * FROM t WHERE id = %s", [1], 'db') == \
+        QueryResultCache.make_key("SELECT *  FROM t\nWHERE id = %s;", (1,), 'db')
+    assert QueryResultCache.make_key("SELECT * FROM t", None, 'db1') != \
+        QueryResultCache.make_key("SELECT * FROM t", None, 'db2')
+
+    # Câu đọc không tất định / có khóa / không phân tích chắc chắn được
+    for sql in [
+        "SELECT * FROM t ORDER BY RAND() LIMIT 1",
+        "SELECT * FROM t WHERE created_at < NOW()",
+        "SELECT * FROM t FOR UPDATE",
+        "SELECT * FROM t FOR SHARE",
+        "SELECT * FROM t FOR SHARE SKIP LOCKED",
+        "SELECT * FROM t LOCK IN SHARE MODE",
+        "SELECT * FROM t WHERE id IN (SELECT id FROM t2)",
+        "SELECT * FROM (SELECT * FROM t) x",
+        "SELECT * FROM t1 UNION SELECT * FROM t2",
+        "SELECT * FROM t USE INDEX (idx) WHERE id = 1",
+        "SELECT id INTO @x FROM t",
+        "SELECT * FROM t WHERE id = @x",
+        "SELECT * FROM t WHERE x = @@session.sql_mode",
+        "SELECT * FROM t WHERE created_at < CURRENT_TIMESTAMP",
+        "SELECT * FROM t WHERE created_at > LOCALTIMESTAMP",
+        "SELECT * FROM t WHERE created_at > LOCALTIME",
+        "SELECT * FROM t WHERE d = CURRENT_DATE",
+        "SELECT * FROM t WHERE d = CURDATE()",
+        "SELECT * FROM t WHERE d = CURTIME()",
+        "SELECT * FROM t WHERE d < UTC_TIMESTAMP()",
+        "SELECT * FROM t WHERE d < UTC_TIMESTAMP",
+        "SELECT SLEEP(1) FROM t",
+        "SELECT RANDOM_BYTES(8) FROM t",
+        "SELECT CURRENT_USER() FROM t",
+        "SELECT CURRENT_USER FROM t",
+        "SELECT DATABASE() FROM t",
+        "SELECT my_stored_fn(id) FROM t",
+        "SELECT db.my_stored_fn(id) FROM t",
+        "SELECT `my_stored_fn`(id) FROM t",
+        "SELECT 1",
+        "SHOW TABLES"
+    ]:
+        assert not QueryResultCache.is_cacheable(sql), sql
+    assert QueryResultCache.is_cacheable("SELECT 'rand(' FROM t")
+    assert QueryResultCache.is_cacheable("SELECT * FROM t WHERE email = 'a@b.c'")
+    assert QueryResultCache.is_cacheable("SELECT COUNT(*), MAX(id) FROM t WHERE id IN (1, 2)")
+    assert QueryResultCache.is_cacheable("SELECT * FROM t1 JOIN t2 USING (id)")
+
+    # Bảng đọc trong câu join
+    assert _read_tables("SELECT * FROM t1 a, t2 b WHERE a.id = b.id") == {'t1', 't2'}
+    assert _read_tables("SELECT * FROM t1 a, t2") == {'t1', 't2'}
+    assert _read_tables("SELECT * FROM db.t1 AS a LEFT JOIN `t2` b ON a.id = b.id "
+                        "JOIN t3 USING (id) ORDER BY a.id") == {'t1', 't2', 't3'}
+
+    # Bảng bị ghi, kể cả modifier và UPDATE/DELETE nhiều bảng
+    assert write_tables("INSERT t2 VALUES (1)") == {'t2'}
+    assert write_tables("INSERT LOW_PRIORITY IGNORE INTO db.t2 (x) VALUES (1)") == {'t2'}
+    assert write_tables("REPLACE DELAYED INTO t2 VALUES (1)") == {'t2'}
+    assert write_tables("UPDATE LOW_PRIORITY t2 SET x = 1") == {'t2'}
+    assert write_tables("UPDATE t1, t2 SET t2.x = 1 WHERE t1.id = t2.id") == {'t1', 't2'}
+    assert write_tables("UPDATE t1 a JOIN t2 b ON a.id = b.id SET b.x = 1") == {'t1', 't2'}
+    assert write_tables("DELETE LOW_PRIORITY FROM t2 WHERE id = 1") == {'t2'}
+    assert write_tables("DELETE QUICK IGNORE FROM t2") == {'t2'}
+    assert write_tables("DELETE t1 FROM t1 JOIN t2 ON t1.id = t2.id WHERE t2.x = 1") == {'t1', 't2'}
+    assert write_tables("DELETE FROM t1.*, t2 USING t1 JOIN t2 ON t1.id = t2.id") == {'t1', 't2'}
+    assert write_tables("TRUNCATE TABLE t1") == {'t1'}
+    assert write_tables("ALTER TABLE t1 ADD COLUMN x INT") == {'t1'}
+    assert write_tables("DROP TABLE IF EXISTS t1, t2") == {'t1', 't2'}
+    assert write_tables("RENAME TABLE t1 TO t3") == {'t1', 't3'}
+    assert write_tables("SELECT * FROM t1") == set()
+    assert write_tables("DROP DATABASE db") is None
+    assert write_tables("CALL refresh_all()") is None
+    assert write_tables("UPDATE t1 SET x = (SELECT MAX(y) FROM t2)") == {'t1'}
+    assert write_tables("UPDATE t1 JOIN t2 ON t1.a IN (1, 2) SET t1.x = 1") is None
+
+    # Invalidate theo bảng với kết quả join và câu ghi nhiều bảng
+    cache = QueryResultCache(ttl=None, write_holdoff=0)
+    cursor = FakeCursor()
+    join_sql = "SELECT * FROM t1 a, t2 b WHERE a.id = b.id AND a.id = %s"
+    cache.execute(cursor, join_sql, (1,), 'db')
+    cache.execute(cursor, join_sql, (1,), 'db')
+    assert cursor.executed == 1
+    assert cache.invalidate_for_write("UPDATE t2 SET x = 1") == {'t2'}
+    assert cache.stats()['entries'] == 0
+    cache.execute(cursor, join_sql, (1,), 'db')
+    cache.execute(cursor, "SELECT * FROM t3 WHERE id = %s", (1,), 'db')
+    cache.invalidate_for_write("DELETE t1 FROM t1 JOIN t4 ON t1.id = t4.id")
+    assert cache.stats()['entries'] == 1
+    cache.invalidate_for_write("CALL refresh_all()")
+    assert cache.stats()['entries'] == 0
+
+    # Không nhận kết quả đọc bắt đầu trước khi invalidate, hoặc trong holdoff
+    cache = QueryResultCache(ttl=None, write_holdoff=0)
+    key = cache.make_key("SELECT * FROM t1", None, 'db')
+    read_started = time.monotonic()
+    cache.invalidate_table('t1')
+    assert not cache.put(key, "SELECT * FROM t1", [(1,)], read_started=read_started)
+    cache = QueryResultCache(ttl=None, write_holdoff=60)
+    cache.invalidate_table('t1')
+    assert not cache.put(key, "SELECT * FROM t1", [(1,)])
+    assert cache.put(key, "SELECT * FROM t2", [(1,)])
+
+    # Người gọi sửa kết quả không làm thay đổi dữ liệu trong cache
+    cache = QueryResultCache(ttl=None)
+    cursor = FakeCursor()
+    rows = cache.execute(cursor, "SELECT * FROM t WHERE id = %s", (1,), 'db')
+    rows.append(('x',))
+    rows = cache.execute(cursor, "SELECT * FROM t WHERE id = %s", (1,), 'db')
+    assert rows == [((1,),)]
+    rows.pop()
+    assert cache.execute(cursor, "SELECT * FROM t WHERE id = %s", (1,), 'db') == [((1,),)]
+    assert cursor.executed == 1
+
+    # Eviction theo max_entries (LRU)
+    cache = QueryResultCache(max_entries=2, ttl=None)
+    keys = [cache.make_key("SELECT * FROM t WHERE id = %s", (i,)) for i in range(3)]
+    cache.put(keys[0], "SELECT * FROM t", [(0,)])
+    cache.put(keys[1], "SELECT * FROM t", [(1,)])
+    assert cache.get(keys[0]) is not None
+    cache.put(keys[2], "SELECT * FROM t", [(2,)])
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None and cache.get(keys[2]) is not None
+    assert cache.stats()['evictions'] == 1
+
+    # Eviction theo max_bytes
+    row_size = _estimate_size([('x' * 100,)])
+    cache = QueryResultCache(max_bytes=row_size * 2, ttl=None)
+    for key in keys:
+        cache.put(key, "SELECT * FROM t", [('x' * 100,)])
+    stats = cache.stats()
+    assert stats['entries'] == 2 and stats['bytes'] <= row_size * 2 and stats['evictions'] == 1
+    assert not cache.put(keys[0], "SELECT * FROM t", [('x' * 1000,)] * 10)
+
+    # Hết hạn theo TTL
+    cache = QueryResultCache(ttl=0.05)
+    cache.put(keys[0], "SELECT * FROM t", [(0,)])
+    assert cache.get(keys[0]) is not None
+    time.sleep(0.1)
+    assert cache.get(keys[0]) is None
+    assert cache.stats()['entries'] == 0
+
+    print("✅ QueryResultCache: tất cả kiểm tra đều đạt")
+
+
+if __name__ == "__main__":
+    _self_check()
@@ -3,13 +3,17 @@ import time
 import random
 import string
 import threading
+import argparse
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from query_cache import QueryResultCache
 
 class DatabaseReplicationTest:
-    def __init__(self, master_config, slave_configs):
+    def __init__(self, master_config, slave_configs, query_cache=None):
         self.master_config = master_config
         self.slave_configs = slave_configs
         self.test_database = 'replication_test_db'
+        # Cache kết quả đọc từ slave (tùy chọn), None để đọc trực tiếp
+        self.query_cache = query_cache
 
     def _get_connection(self, config, is_read_only=False):
         try:
@@ -26,6 +30,35 @@ class DatabaseReplicationTest:
             print(f"Kết nối không thành công: {e}")
             return None
 
+    def _execute_write(self, cursor, sql, params=None, query_cache=None, touched_tables=None):
+        # Ghi lên master, invalidate ngay các bảng bị thay đổi và ghi nhận vào
+        # touched_tables để invalidate lại sau khi commit (xem _commit).
+        # Slave có độ trễ replication nên kết quả cũ vẫn có thể được cache lại
+        # sau khoảng write_holdoff; giới hạn độ mới thực sự của cache là TTL.
+        # Invalidate chỉ theo bảng có trong câu lệnh, không tính trigger, CASCADE
+        # hay view (xem docstring của QueryResultCache).
+        cursor.execute(sql, params)
+        if query_cache is not None:
+            tables = query_cache.invalidate_for_write(sql)
+            if touched_tables is not None:
+                touched_tables.append(tables)
+
+    def _commit(self, conn, query_cache=None, touched_tables=None):
+        # Commit trên master rồi invalidate lại các bảng đã ghi, để bỏ các kết quả
+        # được đọc từ slave trong lúc giao dịch chưa commit
+        conn.commit()
+        if query_cache is not None and touched_tables:
+            for tables in touched_tables:
+                query_cache.invalidate_tables(tables)
+            touched_tables.clear()
+
+    def _execute_read(self, cursor, sql, params=None, query_cache=None):
+        # Đọc từ slave, qua cache nếu được truyền vào
+        if query_cache is not None:
+            return query_cache.execute(cursor, sql, params, database=self.test_database)
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
     def setup_test_database(self):
         master_conn = self._get_connection(self.master_config)
         cursor = master_conn.cursor()
@@ -54,6 +87,9 @@ class DatabaseReplicationTest:
         master_conn = self._get_connection(self.master_config)
         master_cursor = master_conn.cursor()
 
+        query_cache = self.query_cache
+        touched_tables = []
+
         start_time = time.time()
 
         try:
@@ -62,9 +98,10 @@ class DatabaseReplicationTest:
             # Chèn dữ liệu
             for _ in range(num_inserts):
                 random_data = ''.join(random.choices(string.ascii_letters, k=50))
-                master_cursor.execute("INSERT INTO performance_test (data) VALUES (%s)", (random_data,))
+                self._execute_write(master_cursor, "INSERT INTO performance_test (data) VALUES (%s)", (random_data,),
+                                    query_cache=query_cache, touched_tables=touched_tables)
             
-            master_conn.commit()
+            self._commit(master_conn, query_cache=query_cache, touched_tables=touched_tables)
             insert_time = time.time()
             print(f"✍️ Ghi {num_inserts} bản ghi: {insert_time - start_time:.4f} giây")
 
@@ -79,8 +116,8 @@ class DatabaseReplicationTest:
                     
                     # Thực hiện select với số lượng gấp 10 lần số insert
                     for _ in range(num_inserts * select_multiplier):
-                        slave_cursor.execute("SELECT * FROM performance_test ORDER BY RAND() LIMIT 1")
-                        slave_cursor.fetchall()
+                        self._execute_read(slave_cursor, "SELECT * FROM performance_test ORDER BY RAND() LIMIT 1",
+                                           query_cache=query_cache)
 
                     slave_end_time = time.time()
 
@@ -119,7 +156,114 @@ class DatabaseReplicationTest:
             master_cursor.close()
             master_conn.close()
 
+    def cache_benchmark_test(self, num_reads=10000, working_set=100, write_every=0, query_cache=None):
+        """
+        So sánh thông lượng đọc trên slave khi có và không có cache kết quả.
+        Luôn chạy kịch bản chỉ đọc; nếu write_every > 0 thì chạy thêm kịch bản
+        xen kẽ ghi lên master để thấy ảnh hưởng của invalidation và write_holdoff
+
+        :param num_reads: Số lượng select thực hiện trên mỗi slave cho mỗi lần chạy
+        :param working_set: Số lượng id khác nhau được đọc lặp lại
+        :param write_every: Cứ sau bao nhiêu lần đọc thì ghi một bản ghi lên master (0 để tắt)
+        :param query_cache: Cache dùng cho lần chạy có cache, mặc định là self.query_cache
+                            hoặc một QueryResultCache mới
+        :return: Danh sách kết quả theo từng slave và từng kịch bản
+        """
+        cache = query_cache or self.query_cache or QueryResultCache()
+        query = "SELECT * FROM performance_test WHERE id = %s"
+        ids = [random.randint(1, working_set) for _ in range(num_reads)]
+
+        def run_reads(slave_config, run_cache, run_write_every):
+            master_conn = None
+            master_cursor = None
+            slave_conn = self._get_connection(slave_config, is_read_only=True)
+            slave_conn.database = self.test_database
+            slave_cursor = slave_conn.cursor()
+            if run_write_every:
+                master_conn = self._get_connection(self.master_config)
+                master_conn.database = self.test_database
+                master_cursor = master_conn.cursor()
+
+            touched_tables = []
+            try:
+                read_start_time = time.time()
+                for i, record_id in enumerate(ids, 1):
+                    self._execute_read(slave_cursor, query, (record_id,), query_cache=run_cache)
+                    if run_write_every and i % run_write_every == 0:
+                        random_data = ''.join(random.choices(string.ascii_letters, k=50))
+                        self._execute_write(master_cursor, "INSERT INTO performance_test (data) VALUES (%s)", (random_data,),
+                                            query_cache=run_cache, touched_tables=touched_tables)
+                        self._commit(master_conn, query_cache=run_cache, touched_tables=touched_tables)
+                return time.time() - read_start_time
+            finally:
+                slave_cursor.close()
+                slave_conn.close()
+                if master_conn is not None:
+                    master_cursor.close()
+                    master_conn.close()
+
+        def run_scenario(slave_config, scenario, run_write_every):
+            uncached_time = run_reads(slave_config, None, run_write_every)
+            cache.clear()
+            before = cache.stats()
+            cached_time = run_reads(slave_config, cache, run_write_every)
+            after = cache.stats()
+            hits = after['hits'] - before['hits']
+            lookups = hits + after['misses'] - before['misses']
+
+            result = {
+                'host': slave_config['host'],
+                'port': slave_config['port'],
+                'scenario': scenario,
+                'read_count': num_reads,
+                'uncached_qps': num_reads / uncached_time if uncached_time else 0.0,
+                'cached_qps': num_reads / cached_time if cached_time else 0.0,
+                'hit_rate': hits / lookups if lookups else 0.0,
+                'evictions': after['evictions'] - before['evictions'],
+                'invalidations': after['invalidations'] - before['invalidations'],
+                'cache_bytes': after['bytes']
+            }
+            result['speedup'] = result['cached_qps'] / result['uncached_qps'] if result['uncached_qps'] else 0.0
+            return result
+
+        scenarios = [('chỉ đọc', 0)]
+        if write_every:
+            scenarios.append((f'ghi mỗi {write_every} lần đọc', write_every))
+
+        results = []
+        for slave_config in self.slave_configs:
+            for scenario, run_write_every in scenarios:
+                try:
+                    results.append(run_scenario(slave_config, scenario, run_write_every))
+                except Exception as e:
+                    print(f"❌ Lỗi benchmark cache ở {slave_config['host']} ({scenario}): {e}")
+
+        # In kết quả
+        for result in results:
+            print(f"📦 Slave {result['host']}:{result['port']} (cache, {result['scenario']}):")
+            print(f"   - Số lượng select: {result['read_count']}")
+            print(f"   - Tỉ lệ hit: {result['hit_rate']:.2%}")
+            print(f"   - Thông lượng không cache: {result['uncached_qps']:.1f} select/giây")
+            print(f"   - Thông lượng có cache: {result['cached_qps']:.1f} select/giây (x{result['speedup']:.2f})")
+            print(f"   - Eviction: {result['evictions']}, invalidation: {result['invalidations']}, "
+                  f"bộ nhớ cache cuối lần chạy: {result['cache_bytes']} byte")
+
+        return results
+
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cache-benchmark', action='store_true',
+                        help='Đo tỉ lệ hit và thông lượng đọc khi có cache (chỉ cache các câu SELECT tất định)')
+    parser.add_argument('--cache-ttl', type=float, default=30.0)
+    parser.add_argument('--cache-max-entries', type=int, default=10000)
+    parser.add_argument('--cache-max-mb', type=int, default=64)
+    parser.add_argument('--cache-write-holdoff', type=float, default=1.0,
+                        help='Số giây không cache kết quả của một bảng sau khi bảng đó bị ghi; áp dụng '
+                             'cho toàn bộ bảng nên bảng được ghi thường xuyên hơn sẽ không được cache')
+    parser.add_argument('--cache-write-every', type=int, default=500,
+                        help='Chạy thêm kịch bản ghi lên master sau mỗi N lần đọc, bên cạnh kịch bản chỉ đọc (0 để tắt)')
+    args = parser.parse_args()
+
     master_config = {
         'host': 'localhost',
         'port': 3308,
@@ -149,5 +293,16 @@ def main():
     test.setup_test_database()
     test.insert_select_test(num_inserts=1000, select_multiplier=10)
 
+    if args.cache_benchmark:
+        query_cache = QueryResultCache(
+            max_entries=args.cache_max_entries,
+            max_bytes=args.cache_max_mb * 1024 * 1024,
+            ttl=args.cache_ttl,
+            write_holdoff=args.cache_write_holdoff
+        )
+        print("🚀 Bắt đầu benchmark cache kết quả đọc")
+        test.cache_benchmark_test(num_reads=10000, working_set=100, write_every=args.cache_write_every,
+                                  query_cache=query_cache)
+
 if __name__ == "__main__":
     main()